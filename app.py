@@ -1,19 +1,50 @@
 import os
+import asyncio
+import base64
+import hashlib
+import json
+import mimetypes
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait
 from datetime import datetime
+import numpy as np
+from scipy.spatial import cKDTree
 import streamlit as st
 import folium
 from folium import raster_layers
 from streamlit_folium import st_folium
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # ============================================================================
 # ENV + LLM CLIENT SETUP
 # ============================================================================
 load_dotenv()  # Load variables from .env
 
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key) if api_key else None
+# Per-request timeout for the OpenAI client, and the longest the script thread
+# waits for the next streamed delta before leaving the answer pending
+LLM_TIMEOUT_S = 30
+
+
+@st.cache_resource
+def get_openai_client():
+    """Create the OpenAI client once so its connection pool survives reruns."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    return AsyncOpenAI(api_key=api_key, timeout=LLM_TIMEOUT_S, max_retries=1)
+
+
+@st.cache_resource
+def get_llm_loop() -> asyncio.AbstractEventLoop:
+    """Background event loop that runs LLM calls off the Streamlit script thread."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+    return loop
+
 
 # ============================================================================
 # DUMMY STATIC DATA - Single Scenario
@@ -49,6 +80,18 @@ DANGER_ZONES = {
     ]
 }
 
+
+@st.cache_resource
+def _zone_index():
+    """
+    Zone lookup by id and a KD-tree over zone coordinates for nearest-zone
+    click matching. Built once per process rather than on every rerun.
+    """
+    zones = DANGER_ZONES["zones"]
+    by_id = {z["zone_id"]: z for z in zones}
+    tree = cKDTree(np.array([[z["lat"], z["lon"]] for z in zones]))
+    return by_id, tree
+
 # Dummy historical data per zone (for chatbot context)
 HISTORY_DATA = {
     "Z1": [
@@ -87,6 +130,7 @@ ZONE_OVERLAYS = {
 # Helper Functions - Data & LLM
 # ============================================================================
 
+@st.cache_data(show_spinner=False)
 def get_spill_geojson(zone_id: str):
     """
     Return dummy "spills" as feature collections WITHOUT drawing polygons.
@@ -160,16 +204,28 @@ def get_spill_geojson(zone_id: str):
 
 
 def get_zone_meta(zone_id: str):
-    for z in DANGER_ZONES["zones"]:
-        if z["zone_id"] == zone_id:
-            return z
-    return None
+    zone_by_id, _ = _zone_index()
+    return zone_by_id.get(zone_id)
+
+
+@st.cache_resource(show_spinner=False)
+def spill_options(zone_id: str) -> tuple:
+    """(spill_id, selectbox label) pairs for a zone; immutable, so shared uncopied."""
+    options = []
+    for f in get_spill_geojson(zone_id).get("features", []):
+        p = f["properties"]
+        sid = p.get("spill_id", "Unknown")
+        options.append((sid, f"{sid} | {p.get('thickness_class','unknown')} | {p.get('area_km2',0)} km²"))
+    return tuple(options)
+
+
+NO_HISTORY_MSG = "No historical spills recorded for this zone."
 
 
 def get_history_summary(zone_id: str) -> str:
     events = HISTORY_DATA.get(zone_id, [])
     if not events:
-        return "No historical spills recorded for this zone."
+        return NO_HISTORY_MSG
 
     total_events = len(events)
     total_area = sum(e["area_km2"] for e in events)
@@ -184,14 +240,82 @@ def get_history_summary(zone_id: str) -> str:
     )
 
 
-def get_ai_response(zone_meta, spill_props, history_text: str, user_question: str) -> str:
-    """Call LLM API with contextual prompt."""
-    if client is None:
-        return (
-            "⚠️ LLM API key not configured. "
-            "Set OPENAI_API_KEY in your environment to enable the assistant."
-        )
+@st.cache_resource(show_spinner=False)
+def history_summaries() -> dict:
+    """
+    Summary text for every zone in HISTORY_DATA, computed on first use only.
+    Read-only, so it is shared via cache_resource instead of copied per call.
+    """
+    return {zid: get_history_summary(zid) for zid in HISTORY_DATA}
+
+
+SHORT_ANSWER_TOKENS = 150
+FULL_ANSWER_TOKENS = 400
+ANSWER_CACHE_TTL_S = 3600
+ANSWER_CACHE_MAX_ENTRIES = 256
+
+
+@st.cache_resource
+def _llm_answer_cache():
+    """
+    Completed LLM answers shared across sessions, as (lock, OrderedDict of
+    prompt hash -> (stored_at, answer)). The lock is needed because answers
+    are stored from the background LLM thread.
+    """
+    return threading.Lock(), OrderedDict()
+
+
+def cache_get_answer(cache, prompt_key: str):
+    """Return a cached answer, or None if missing or older than the TTL."""
+    lock, entries = cache
+    with lock:
+        entry = entries.get(prompt_key)
+        if entry is None:
+            return None
+        stored_at, answer = entry
+        if time.monotonic() - stored_at > ANSWER_CACHE_TTL_S:
+            del entries[prompt_key]
+            return None
+        entries.move_to_end(prompt_key)
+        return answer
+
+
+def cache_put_answer(cache, prompt_key: str, answer):
+    """Store an answer, evicting the least recently used beyond the size cap."""
+    lock, entries = cache
+    with lock:
+        entries[prompt_key] = (time.monotonic(), answer)
+        entries.move_to_end(prompt_key)
+        while len(entries) > ANSWER_CACHE_MAX_ENTRIES:
+            entries.popitem(last=False)
+
+
+SYSTEM_PROMPT = (
+    "You are an expert assisting operators with offshore oil spill analysis. "
+    "Use the provided zone, spill attributes, and historical patterns to infer "
+    "likely sources, risk level, and recommended actions. Be concise but specific "
+    "and avoid inventing data not implied by the context."
+)
+
+NO_API_KEY_MSG = (
+    "⚠️ LLM API key not configured. "
+    "Set OPENAI_API_KEY in your environment to enable the assistant."
+)
 
+# Canned operator questions answered together by "Quick analyses"
+QUICK_QUESTIONS = [
+    "What is the risk level of this spill?",
+    "What is the likely source of this spill?",
+    "What response actions do you recommend?",
+]
+
+
+def build_static_prefix(zone_meta, spill_props, history_text: str) -> str:
+    """
+    System message for a spill conversation: instructions plus the zone, spill
+    and history facts. It is identical on every turn, so the provider's
+    prompt cache can reuse it.
+    """
     zone_name = zone_meta.get("name", zone_meta.get("zone_id", "Unknown zone"))
     scene_id = zone_meta.get("scene_id", "Unknown scene")
     lat = zone_meta.get("lat")
@@ -203,14 +327,9 @@ def get_ai_response(zone_meta, spill_props, history_text: str, user_question: st
     confidence = spill_props.get("confidence", 0)
     oil_type = spill_props.get("oil_type", "unknown")
 
-    system_prompt = (
-        "You are an expert assisting operators with offshore oil spill analysis. "
-        "Use the provided zone, spill attributes, and historical patterns to infer "
-        "likely sources, risk level, and recommended actions. Be concise but specific "
-        "and avoid inventing data not implied by the context."
-    )
+    return f"""
+{SYSTEM_PROMPT}
 
-    user_context = f"""
 Zone context:
 - Name: {zone_name}
 - Zone ID: {zone_meta.get('zone_id')}
@@ -227,35 +346,229 @@ Current spill:
 Historical pattern summary:
 {history_text}
 
-Operator question:
-{user_question}
-
-Respond as an expert spill analyst. Include:
+Respond to operator questions as an expert spill analyst. Answer short,
+direct questions in a few sentences. For broader questions, unless asked
+otherwise, include:
 - Interpretation of historical trend
 - Likely source/risk drivers
 - Risk level (LOW / MEDIUM / HIGH)
 - 2–3 concrete recommended actions.
     """.strip()
 
+
+def get_static_prefix(zone_meta, spill_props, history_text: str) -> str:
+    """Build the static prefix once per (zone, spill) and keep it in session state."""
+    key = f"prefix_{zone_meta.get('zone_id')}_{spill_props.get('spill_id')}"
+    if key not in st.session_state:
+        st.session_state[key] = build_static_prefix(zone_meta, spill_props, history_text)
+    return st.session_state[key]
+
+
+def get_prompt_key(messages: list) -> str:
+    payload = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+async def _astream_into(client, messages: list, max_tokens: int,
+                       parts: list, chunks: queue.Queue):
+    """Stream one completion into `parts` and `chunks`; return its finish_reason."""
+    finish_reason = None
+    stream = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=messages,
+        temperature=0.3,
+        max_tokens=max_tokens,
+        stop=["\n\n\n"],
+        stream=True,
+    )
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        delta = choice.delta.content or ""
+        if delta:
+            parts.append(delta)
+            chunks.put(delta)
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+    return finish_reason
+
+
+async def _astream_answer(client, messages: list, max_tokens: int, chunks: queue.Queue,
+                         cache, prompt_key: str) -> str:
+    """Stream one answer into `chunks` (None marks the end) and return it whole."""
+    parts = []
     try:
-        completion = client.chat.completions.create(
+        finish_reason = await _astream_into(client, messages, max_tokens, parts, chunks)
+        # The short budget ran out: continue once with the rest of the full budget
+        if finish_reason == "length" and max_tokens < FULL_ANSWER_TOKENS:
+            follow_up = [
+                *messages,
+                {"role": "assistant", "content": "".join(parts)},
+                {"role": "user", "content": "Continue exactly where you stopped."},
+            ]
+            finish_reason = await _astream_into(
+                client, follow_up, FULL_ANSWER_TOKENS - max_tokens, parts, chunks
+            )
+    except Exception as e:
+        # Keep any partial text the user already saw, so history matches the screen
+        error = f"⚠️ Error calling LLM API: {e}"
+        if parts:
+            error = "\n\n" + error
+        chunks.put(error)
+        chunks.put(None)
+        return "".join(parts) + error
+
+    answer = "".join(parts)
+    if finish_reason == "length":
+        # Still truncated: tell the user, and never cache a cut-off answer
+        note = "\n\n_⚠️ Answer cut off at the length limit._"
+        chunks.put(note)
+        answer += note
+    else:
+        cache_put_answer(cache, prompt_key, answer)
+    chunks.put(None)
+    return answer
+
+
+def _done_future(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _finished(answer: str):
+    """Future and chunk queue for an answer that is already known."""
+    future = _done_future(answer)
+    chunks = queue.Queue()
+    chunks.put(answer)
+    chunks.put(None)
+    return future, chunks
+
+
+def submit_ai_response(static_prefix: str, chat_history: list, user_question: str):
+    """
+    Start answering on the background LLM loop.
+    Returns (future, chunks): the future resolves to the full answer, and
+    chunks receives text deltas as they stream in, terminated by None.
+    The answer keeps generating even if a rerun stops the script meanwhile.
+    """
+    client = get_openai_client()
+    if client is None:
+        return _finished(NO_API_KEY_MSG)
+
+    messages = [
+        {"role": "system", "content": static_prefix},
+        *chat_history,
+        {"role": "user", "content": user_question},
+    ]
+    prompt_key = get_prompt_key(messages)
+
+    cache = _llm_answer_cache()
+    cached = cache_get_answer(cache, prompt_key)
+    if cached is not None:
+        return _finished(cached)
+
+    # Short questions get a smaller output budget; decode time scales with it
+    max_tokens = SHORT_ANSWER_TOKENS if len(user_question) < 60 else FULL_ANSWER_TOKENS
+
+    chunks = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        _astream_answer(client, messages, max_tokens, chunks, cache, prompt_key),
+        get_llm_loop(),
+    )
+    return future, chunks
+
+
+def iter_chunks(chunks: queue.Queue):
+    """
+    Yield streamed text deltas until the end marker, for st.write_stream.
+    Stops early if no delta arrives within LLM_TIMEOUT_S; the answer then
+    stays pending and is picked up on a later run.
+    """
+    while True:
+        try:
+            delta = chunks.get(timeout=LLM_TIMEOUT_S)
+        except queue.Empty:
+            return
+        if delta is None:
+            return
+        yield delta
+
+
+async def _aquick_analyses(client, messages: list, cache, prompt_key: str) -> list:
+    """
+    Run the batched quick questions and return (question, answer) pairs.
+    A truncated or malformed reply becomes an error per question and is never cached.
+    """
+    try:
+        completion = await client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_context},
-            ],
+            messages=messages,
             temperature=0.3,
-            max_tokens=400,
+            max_tokens=900,
+            response_format={"type": "json_object"},
         )
-        return completion.choices[0].message.content
     except Exception as e:
-        return f"⚠️ Error calling LLM API: {e}"
+        return [(q, f"⚠️ Error calling LLM API: {e}") for q in QUICK_QUESTIONS]
+
+    choice = completion.choices[0]
+    if choice.finish_reason != "stop":
+        msg = f"⚠️ Quick analysis was cut off (finish reason: {choice.finish_reason}). Ask in the chat instead."
+        return [(q, msg) for q in QUICK_QUESTIONS]
+    try:
+        parsed = json.loads(choice.message.content)["answers"]
+    except (ValueError, KeyError, TypeError):
+        parsed = None
+    if not isinstance(parsed, list) or len(parsed) != len(QUICK_QUESTIONS):
+        msg = "⚠️ Quick analysis returned an unexpected format. Please try again."
+        return [(q, msg) for q in QUICK_QUESTIONS]
+
+    result = list(zip(QUICK_QUESTIONS, (str(a) for a in parsed)))
+    cache_put_answer(cache, prompt_key, result)
+    return result
+
+
+def submit_quick_analyses(static_prefix: str) -> Future:
+    """
+    Start answering all QUICK_QUESTIONS with a single LLM request on the
+    background loop. The future resolves to a list of (question, answer) pairs.
+    """
+    client = get_openai_client()
+    if client is None:
+        return _done_future([(q, NO_API_KEY_MSG) for q in QUICK_QUESTIONS])
+
+    questions = "\n".join(f"{i}. {q}" for i, q in enumerate(QUICK_QUESTIONS, 1))
+    user_content = f"""
+Operator questions:
+{questions}
+
+Answer each question concisely. Reply with a JSON object of the form
+{{"answers": ["<answer 1>", "<answer 2>", ...]}}, one answer per question,
+in the same order.
+    """.strip()
+
+    messages = [
+        {"role": "system", "content": static_prefix},
+        {"role": "user", "content": user_content},
+    ]
+    prompt_key = get_prompt_key(messages)
+    cache = _llm_answer_cache()
+    cached = cache_get_answer(cache, prompt_key)
+    if cached is not None:
+        return _done_future(cached)
+
+    return asyncio.run_coroutine_threadsafe(
+        _aquick_analyses(client, messages, cache, prompt_key), get_llm_loop()
+    )
 
 
+@st.cache_data(show_spinner=False)
 def init_cleanup_status() -> dict:
     """
     Initialize cleanup status for all spills.
     Status: 'idle' | 'cleaning' | 'done'
+    Cached with st.cache_data so every session gets its own copy to mutate.
     """
     status = {}
     for zone in DANGER_ZONES["zones"]:
@@ -267,6 +580,19 @@ def init_cleanup_status() -> dict:
     return status
 
 
+@st.cache_resource(show_spinner=False)
+def base_rows() -> tuple:
+    """
+    (zone_id, spill_id) pairs for the sidebar status table; only Status varies.
+    An immutable tuple, so it is shared via cache_resource instead of copied.
+    """
+    return tuple(
+        (z["zone_id"], f["properties"].get("spill_id", "Unknown"))
+        for z in DANGER_ZONES["zones"]
+        for f in get_spill_geojson(z["zone_id"]).get("features", [])
+    )
+
+
 def get_spill_color(thickness: str, status: str) -> str:
     """
     Decide polygon color based on spill thickness and cleanup status.
@@ -281,6 +607,135 @@ def get_spill_color(thickness: str, status: str) -> str:
     base_colors = {"thick": "red", "medium": "orange", "thin": "yellow"}
     return base_colors.get(thickness, "gray")
 
+
+# ============================================================================
+# Helper Functions - Map
+# ============================================================================
+
+# Static shell of the spill info box; only the zone id and spill lines vary
+_INFO_BOX_TEMPLATE = """
+<div style="
+    background-color: rgba(0, 0, 0, 0.75);
+    color: white;
+    padding: 8px 10px;
+    border-radius: 8px;
+    font-size: 11px;
+    min-width: 180px;
+    max-width: 260px;
+    display: inline-block;
+    box-shadow: 0 0 6px rgba(0,0,0,0.5);
+">
+    <div style="font-weight: 600; margin-bottom: 4px;">
+        Spills in {zone_id}
+    </div>
+    {body}
+</div>
+"""
+
+
+@st.cache_resource
+def get_overlay_data_uris() -> dict:
+    """Overlay images read and base64-encoded once, keyed by zone id."""
+    uris = {}
+    for zid, cfg in ZONE_OVERLAYS.items():
+        mime = mimetypes.guess_type(cfg["image"])[0] or "image/jpeg"
+        with open(cfg["image"], "rb") as fh:
+            uris[zid] = f"data:{mime};base64," + base64.b64encode(fh.read()).decode()
+    return uris
+
+
+def build_map(zone_id, features, cleanup_status: dict) -> folium.Map:
+    """
+    Build the Folium map: danger zone markers plus, for the selected zone,
+    the spill info box and overlay image.
+    """
+    # Determine map center
+    if zone_id:
+        zm = get_zone_meta(zone_id)
+        if zm:
+            map_center = [zm["lat"], zm["lon"]]
+            zoom_level = 10
+        else:
+            map_center = [40.4, 50.0]
+            zoom_level = 8
+    else:
+        map_center = [40.4, 50.0]
+        zoom_level = 8
+
+    m = folium.Map(
+        location=map_center,
+        zoom_start=zoom_level,
+        tiles="Esri.WorldImagery",
+    )
+
+    # Draw info box + overlays for selected zone (no polygons)
+    if zone_id and features:
+        is_overlay_zone = zone_id in ZONE_OVERLAYS
+        lines = []
+
+        # Build info box text (no polygon drawing)
+        for ft in features:
+            p = ft["properties"]
+            sid = p.get("spill_id", "Unknown")
+            th = p.get("thickness_class", "unknown")
+            conf = p.get("confidence", 0)
+            oil_type = p.get("oil_type", "unknown")
+            area_km2 = p.get("area_km2", 0)
+            status_val = cleanup_status.get(sid, "idle")
+
+            lines.append(
+                f"<b>{sid}</b>: {oil_type}, {area_km2} km², {th}, "
+                f"{conf:.0%} conf., status: {status_val}"
+            )
+
+        # Info box (stays the same for all zones)
+        info_html = _INFO_BOX_TEMPLATE.format(zone_id=zone_id, body="<br>".join(lines))
+
+        label_lat = map_center[0] + 0.10
+        label_lon = map_center[1] + 0.10
+
+        folium.Marker(
+            location=[label_lat, label_lon],
+            icon=folium.DivIcon(html=info_html),
+        ).add_to(m)
+
+        # 🖼️ If this zone has an overlay configured, add PNG on top
+        if is_overlay_zone:
+            cfg = ZONE_OVERLAYS[zone_id]
+            raster_layers.ImageOverlay(
+                name=f"{zone_id} overlay",
+                image=get_overlay_data_uris()[zone_id],
+                bounds=cfg["bounds"],
+                opacity=cfg.get("opacity", 0.8),
+                interactive=False,
+                cross_origin=False,
+                zindex=3,
+            ).add_to(m)
+
+    # Danger zone markers
+    for zone in DANGER_ZONES["zones"]:
+        is_sel = zone_id == zone["zone_id"]
+        marker_color = "darkred" if is_sel else "red"
+
+        popup_html = f"""
+        <div style="font-family: Arial; min-width: 150px;">
+            <p style="margin: 3px 0;"><b>Zone ID:</b> {zone['zone_id']}</p>
+            <p style="margin: 3px 0;"><b>Scene:</b> {zone['scene_id']}</p>
+            <p style="margin: 3px 0;"><b>Coordinates:</b> {zone['lat']:.2f}°N, {zone['lon']:.2f}°E</p>
+            <p style="margin: 5px 0; color: #ccc; font-size: 0.9em;">Click to zoom and view overlay</p>
+        </div>
+        """
+
+        folium.Marker(
+            location=[zone["lat"], zone["lon"]],
+            popup=folium.Popup(popup_html, max_width=200),
+            tooltip=zone["zone_id"],
+            icon=folium.Icon(color=marker_color, icon="exclamation-triangle", prefix="fa"),
+        ).add_to(m)
+
+    return m
+
+
 # ============================================================================
 # Page configuration
 # ============================================================================
@@ -298,6 +753,10 @@ if "selected_spill_id" not in st.session_state:
     st.session_state.selected_spill_id = None
 if "chat_messages" not in st.session_state:
     st.session_state.chat_messages = []
+if "pending_answer" not in st.session_state:
+    st.session_state.pending_answer = None
+if "session_start" not in st.session_state:
+    st.session_state.session_start = datetime.now()
 if "cleanup_status" not in st.session_state:
     st.session_state.cleanup_status = init_cleanup_status()
 
@@ -349,26 +808,18 @@ with st.sidebar:
         st.session_state.selected_zone_id = new_zone_id
         st.session_state.selected_spill_id = None
         st.session_state.chat_messages = []
+        st.session_state.pending_answer = None
         st.rerun()
 
     st.divider()
 
     # 🧹 Cleanup Device Status
     with st.expander("🧹 Cleanup Device Status", expanded=False):
-        rows = []
-        for zone in DANGER_ZONES["zones"]:
-            zid = zone["zone_id"]
-            features = get_spill_geojson(zid).get("features", [])
-            for f in features:
-                sid = f["properties"].get("spill_id", "Unknown")
-                status_val = st.session_state.cleanup_status.get(sid, "idle")
-                rows.append(
-                    {
-                        "Zone": zid,
-                        "Spill ID": sid,
-                        "Status": status_val.capitalize(),
-                    }
-                )
+        status = st.session_state.cleanup_status
+        rows = [
+            {"Zone": zid, "Spill ID": sid, "Status": status.get(sid, "idle").capitalize()}
+            for zid, sid in base_rows()
+        ]
         if rows:
             st.table(rows)
         else:
@@ -387,123 +838,223 @@ about potential sources, risk, historical patterns, with decision of clean-up ac
 st.markdown("---")
 
 # ============================================================================
-# Layout: Map (col1) + Assistant (col2) ALWAYS
+# UI FRAGMENTS
 # ============================================================================
-col1, col2 = st.columns([2, 1])
+# Widgets inside a fragment rerun only that fragment, so spill selection and
+# chat turns no longer re-execute the map column and sidebar.
+
+def select_spill(zone_id: str, label: str, **kwargs) -> str:
+    """Spill selectbox for a zone, kept in sync with st.session_state.selected_spill_id."""
+    options = spill_options(zone_id)
+    spill_ids = [sid for sid, _ in options]
+    labels = dict(options)
+
+    if st.session_state.selected_spill_id not in labels:
+        st.session_state.selected_spill_id = spill_ids[0]
+
+    st.session_state.selected_spill_id = st.selectbox(
+        label,
+        options=spill_ids,
+        index=spill_ids.index(st.session_state.selected_spill_id),
+        format_func=labels.get,
+        **kwargs,
+    )
+    return st.session_state.selected_spill_id
 
-# ============================================================================
-# MAP COLUMN
-# ============================================================================
-with col1:
-    st.subheader("🛰️ Interactive Satellite Map - Caspian Sea Danger Zones")
-    st.markdown("---")
 
-    # Determine map center
-    if st.session_state.selected_zone_id:
-        zm = get_zone_meta(st.session_state.selected_zone_id)
-        if zm:
-            map_center = [zm["lat"], zm["lon"]]
-            zoom_level = 10
-        else:
-            map_center = [40.4, 50.0]
-            zoom_level = 8
+def render_chat_message(msg: dict):
+    with st.chat_message("user" if msg["role"] == "user" else "assistant"):
+        st.markdown(msg["content"])
+
+
+def take_pending_result() -> list:
+    """
+    If the background answer in st.session_state.pending_answer has finished,
+    append it to the chat and return the new messages; otherwise return [].
+    """
+    pending = st.session_state.pending_answer
+    if pending is None or not pending.done():
+        return []
+    st.session_state.pending_answer = None
+
+    result = pending.result()
+    if isinstance(result, str):
+        # Chat reply; its question is already in the history
+        new_messages = [{"role": "assistant", "content": result}]
     else:
-        map_center = [40.4, 50.0]
-        zoom_level = 8
+        # Quick analyses: (question, answer) pairs
+        new_messages = []
+        for question, answer in result:
+            new_messages.append({"role": "user", "content": question})
+            new_messages.append({"role": "assistant", "content": answer})
+    st.session_state.chat_messages.extend(new_messages)
+    return new_messages
+
+
+@st.fragment
+def cleanup_fragment(zone_id: str):
+    """Spill picker and dispatch button for the cleanup device."""
+    st.caption("🧹 Cleanup control for selected zone")
+
+    cl_left, cl_right = st.columns([2, 1])
+
+    with cl_left:
+        select_spill(
+            zone_id,
+            "Spill for cleanup",
+            key="cleanup_spill_select",
+            help="Choose which spill to send the cleanup device to.",
+            label_visibility="collapsed",
+        )
 
-    m = folium.Map(
-        location=map_center,
-        zoom_start=zoom_level,
-        tiles="Esri.WorldImagery",
-    )
+    with cl_right:
+        current_status = st.session_state.cleanup_status.get(
+            st.session_state.selected_spill_id, "idle"
+        )
 
-    # Draw info box + overlays for selected zone (no polygons)
-    if st.session_state.selected_zone_id:
-        zone_id = st.session_state.selected_zone_id
-        spill_geojson = get_spill_geojson(zone_id)
-        features = spill_geojson.get("features", [])
-
-        if features:
-            is_overlay_zone = zone_id in ZONE_OVERLAYS
-            lines = []
-
-            # Build info box text (no polygon drawing)
-            for ft in features:
-                p = ft["properties"]
-                sid = p.get("spill_id", "Unknown")
-                th = p.get("thickness_class", "unknown")
-                conf = p.get("confidence", 0)
-                oil_type = p.get("oil_type", "unknown")
-                area_km2 = p.get("area_km2", 0)
-                status_val = st.session_state.cleanup_status.get(sid, "idle")
-
-                lines.append(
-                    f"<b>{sid}</b>: {oil_type}, {area_km2} km², {th}, "
-                    f"{conf:.0%} conf., status: {status_val}"
+        if current_status in ["idle"]:
+            btn_label = "Clean This Spill"
+        elif current_status in ["cleaning"]:
+            btn_label = "Cleaning..."
+        else:
+            btn_label = "Already Cleaned"
+
+        disabled = current_status == "done"
+
+        if st.button(btn_label, use_container_width=True, disabled=disabled):
+            if current_status == "idle":
+                st.session_state.cleanup_status[st.session_state.selected_spill_id] = "cleaning"
+                st.success(
+                    f"Simulated cleanup device dispatched for spill "
+                    f"{st.session_state.selected_spill_id} in zone {zone_id}."
                 )
+            elif current_status == "cleaning":
+                st.session_state.cleanup_status[st.session_state.selected_spill_id] = "done"
+                st.success(
+                    f"Spill {st.session_state.selected_spill_id} marked as cleaned."
+                )
+            # Full-app rerun: the map info box and sidebar table show the status
+            st.rerun(scope="app")
 
-            # Info box (stays the same for all zones)
-            info_html = "<br>".join(lines)
-            info_html = f"""
-            <div style="
-                background-color: rgba(0, 0, 0, 0.75);
-                color: white;
-                padding: 8px 10px;
-                border-radius: 8px;
-                font-size: 11px;
-                min-width: 180px;
-                max-width: 260px;
-                display: inline-block;
-                box-shadow: 0 0 6px rgba(0,0,0,0.5);
-            ">
-                <div style="font-weight: 600; margin-bottom: 4px;">
-                    Spills in {zone_id}
-                </div>
-                {info_html}
-            </div>
-            """
-
-            label_lat = map_center[0] + 0.10
-            label_lon = map_center[1] + 0.10
-
-            folium.Marker(
-                location=[label_lat, label_lon],
-                icon=folium.DivIcon(html=info_html),
-            ).add_to(m)
+    st.caption(
+        f"Status for {st.session_state.selected_spill_id}: "
+        f"**{st.session_state.cleanup_status.get(st.session_state.selected_spill_id, 'idle').capitalize()}**"
+    )
 
-            # 🖼️ If this zone has an overlay configured, add PNG on top
-            if is_overlay_zone:
-                cfg = ZONE_OVERLAYS[zone_id]
-                raster_layers.ImageOverlay(
-                    name=f"{zone_id} overlay",
-                    image=cfg["image"],
-                    bounds=cfg["bounds"],
-                    opacity=cfg.get("opacity", 0.8),
-                    interactive=False,
-                    cross_origin=False,
-                    zindex=3,
-                ).add_to(m)
 
-    # Danger zone markers
-    for zone in DANGER_ZONES["zones"]:
-        is_sel = st.session_state.selected_zone_id == zone["zone_id"]
-        marker_color = "darkred" if is_sel else "red"
+@st.fragment
+def chat_fragment(zone_id: str, features: list, zone_meta: dict, history_text: str):
+    """Spill focus selector, quick analyses and chat for the AI assistant."""
+    # Spill selection for AI reasoning
+    select_spill(
+        zone_id,
+        "Spill Focus",
+        key="assistant_spill_select",
+        help="AI will analyze this spill.",
+    )
 
-        popup_html = f"""
-        <div style="font-family: Arial; min-width: 150px;">
-            <p style="margin: 3px 0;"><b>Zone ID:</b> {zone['zone_id']}</p>
-            <p style="margin: 3px 0;"><b>Scene:</b> {zone['scene_id']}</p>
-            <p style="margin: 3px 0;"><b>Coordinates:</b> {zone['lat']:.2f}°N, {zone['lon']:.2f}°E</p>
-            <p style="margin: 5px 0; color: #ccc; font-size: 0.9em;">Click to zoom and view overlay</p>
-        </div>
-        """
+    # Build context
+    sel_feature = next(
+        f for f in features
+        if f["properties"].get("spill_id") == st.session_state.selected_spill_id
+    )
+    spill_props = sel_feature["properties"]
+    static_prefix = get_static_prefix(zone_meta, spill_props, history_text)
+
+    # An answer interrupted by a rerun keeps generating in the background;
+    # pick it up once it has finished
+    take_pending_result()
+
+    # While an answer is pending, new questions would interleave with it
+    answer_pending = st.session_state.pending_answer is not None
+
+    # One request answers the canned risk / source / actions questions. It runs
+    # in the background like chat answers, so the page stays usable meanwhile
+    if st.button(
+        "⚡ Quick analyses",
+        use_container_width=True,
+        help="Risk, source and recommended actions in one request.",
+        disabled=answer_pending,
+    ):
+        st.session_state.pending_answer = submit_quick_analyses(static_prefix)
+        take_pending_result()
+        answer_pending = st.session_state.pending_answer is not None
+
+    # Chat container with fixed height & scroll
+    chat_box = st.container(height=400, border=True)
+    with chat_box:
+        empty_hint = st.empty()
+        if not st.session_state.chat_messages:
+            empty_hint.caption("Ask a question about this spill or area to get started.")
+
+        for msg in st.session_state.chat_messages:
+            render_chat_message(msg)
+
+        pending_note = st.empty()
+        if answer_pending:
+            with pending_note.container():
+                st.caption("⏳ The assistant is still working on an answer.")
+                # Reruns this fragment, which picks up the answer once it is done
+                st.button("🔄 Check for answer", key="check_pending_answer")
+
+    # Chat input
+    user_query = st.chat_input("Ask about this spill or area...", disabled=answer_pending)
+    if user_query and st.session_state.pending_answer is not None:
+        # A question sent while an earlier answer was generating: add that answer
+        # first if it is ready, so user and assistant turns stay paired
+        with chat_box:
+            for msg in take_pending_result():
+                render_chat_message(msg)
+        if st.session_state.pending_answer is not None:
+            st.warning("The previous answer is still being generated; ask again once it appears.")
+            user_query = None
+        else:
+            pending_note.empty()
 
-        folium.Marker(
-            location=[zone["lat"], zone["lon"]],
-            popup=folium.Popup(popup_html, max_width=200),
-            tooltip=zone["zone_id"],
-            icon=folium.Icon(color=marker_color, icon="exclamation-triangle", prefix="fa"),
-        ).add_to(m)
+    if user_query:
+        # Prior turns go after the static prefix; the new question comes last
+        future, chunks = submit_ai_response(
+            static_prefix, st.session_state.chat_messages, user_query
+        )
+        st.session_state.pending_answer = future
+        st.session_state.chat_messages.append({"role": "user", "content": user_query})
+        # Render the new turn in place instead of rerunning the whole script
+        empty_hint.empty()
+        with chat_box:
+            render_chat_message({"role": "user", "content": user_query})
+            with st.chat_message("assistant"):
+                st.write_stream(iter_chunks(chunks))
+            # The stream ends just before the future resolves; if it stalled
+            # instead, the answer stays pending for a later run
+            wait([future], timeout=1)
+            take_pending_result()
+            if st.session_state.pending_answer is not None:
+                st.caption("⏳ The assistant is still working on an answer.")
+
+    with st.expander("Historical Spill Pattern (used for AI reasoning)", expanded=False):
+        st.write(history_text)
+
+
+# ============================================================================
+# Layout: Map (col1) + Assistant (col2) ALWAYS
+# ============================================================================
+col1, col2 = st.columns([2, 1])
+
+# Spills of the selected zone, shared by the map, cleanup control and assistant
+features = []
+if st.session_state.selected_zone_id:
+    features = get_spill_geojson(st.session_state.selected_zone_id).get("features", [])
+
+# ============================================================================
+# MAP COLUMN
+# ============================================================================
+with col1:
+    st.subheader("🛰️ Interactive Satellite Map - Caspian Sea Danger Zones")
+    st.markdown("---")
+
+    # Built fresh every run: st_folium re-renders the Map it is given, and a
+    # reused Map accumulates duplicate Leaflet JS on each render
+    m = build_map(st.session_state.selected_zone_id, features, st.session_state.cleanup_status)
 
     map_data = st_folium(
         m,
@@ -517,85 +1068,19 @@ with col1:
     if map_data and map_data.get("last_object_clicked"):
         clat = map_data["last_object_clicked"]["lat"]
         clon = map_data["last_object_clicked"]["lng"]
-        min_dist = float("inf")
-        closest = None
-        for zone in DANGER_ZONES["zones"]:
-            d = ((zone["lat"] - clat) ** 2 + (zone["lon"] - clon) ** 2) ** 0.5
-            if d < min_dist:
-                min_dist = d
-                closest = zone
-        if closest and min_dist < 0.2:
+        _, zone_tree = _zone_index()
+        dist, zone_idx = zone_tree.query([clat, clon], k=1)
+        if dist < 0.2:
+            closest = DANGER_ZONES["zones"][int(zone_idx)]
             st.session_state.selected_zone_id = closest["zone_id"]
             st.session_state.selected_spill_id = None
             st.session_state.chat_messages = []
+            st.session_state.pending_answer = None
             st.rerun()
 
     # CLEAN-UP CONTROL NEAR THE MAP
-    if st.session_state.selected_zone_id:
-        spill_geojson = get_spill_geojson(st.session_state.selected_zone_id)
-        features = spill_geojson.get("features", [])
-
-        if features:
-            st.caption("🧹 Cleanup control for selected zone")
-
-            cl_left, cl_right = st.columns([2, 1])
-
-            with cl_left:
-                spill_labels, spill_ids = [], []
-                for f in features:
-                    p = f["properties"]
-                    sid = p.get("spill_id", "Unknown")
-                    label = f"{sid} | {p.get('thickness_class','unknown')} | {p.get('area_km2',0)} km²"
-                    spill_labels.append(label)
-                    spill_ids.append(sid)
-
-                if st.session_state.selected_spill_id not in spill_ids:
-                    st.session_state.selected_spill_id = spill_ids[0]
-
-                default_idx = spill_ids.index(st.session_state.selected_spill_id)
-
-                selected_spill_label = st.selectbox(
-                    "Spill for cleanup",
-                    options=spill_labels,
-                    index=default_idx,
-                    key="cleanup_spill_select",
-                    help="Choose which spill to send the cleanup device to.",
-                    label_visibility="collapsed",
-                )
-                st.session_state.selected_spill_id = spill_ids[spill_labels.index(selected_spill_label)]
-
-            with cl_right:
-                current_status = st.session_state.cleanup_status.get(
-                    st.session_state.selected_spill_id, "idle"
-                )
-
-                if current_status in ["idle"]:
-                    btn_label = "Clean This Spill"
-                elif current_status in ["cleaning"]:
-                    btn_label = "Cleaning..."
-                else:
-                    btn_label = "Already Cleaned"
-
-                disabled = current_status == "done"
-
-                if st.button(btn_label, use_container_width=True, disabled=disabled):
-                    if current_status == "idle":
-                        st.session_state.cleanup_status[st.session_state.selected_spill_id] = "cleaning"
-                        st.success(
-                            f"Simulated cleanup device dispatched for spill "
-                            f"{st.session_state.selected_spill_id} in zone {st.session_state.selected_zone_id}."
-                        )
-                    elif current_status == "cleaning":
-                        st.session_state.cleanup_status[st.session_state.selected_spill_id] = "done"
-                        st.success(
-                            f"Spill {st.session_state.selected_spill_id} marked as cleaned."
-                        )
-                    st.rerun()
-
-            st.caption(
-                f"Status for {st.session_state.selected_spill_id}: "
-                f"**{st.session_state.cleanup_status.get(st.session_state.selected_spill_id, 'idle').capitalize()}**"
-            )
+    if st.session_state.selected_zone_id and features:
+        cleanup_fragment(st.session_state.selected_zone_id)
 
 # ============================================================================
 # CHAT COLUMN (assistant always visible)
@@ -608,69 +1093,15 @@ with col2:
     if not zone_id:
         st.info("Select a danger zone on the map to enable the AI assistant.")
     else:
-        spill_geojson = get_spill_geojson(zone_id)
-        features = spill_geojson.get("features", [])
-
         if not features:
             st.info("No spills detected in this zone. AI assistant is disabled.")
         else:
-            # Spill selection for AI reasoning
-            spill_labels, spill_ids = [], []
-            for f in features:
-                p = f["properties"]
-                sid = p.get("spill_id", "Unknown")
-                label = f"{sid} | {p.get('thickness_class','unknown')} | {p.get('area_km2',0)} km²"
-                spill_labels.append(label)
-                spill_ids.append(sid)
-
-            if st.session_state.selected_spill_id not in spill_ids:
-                st.session_state.selected_spill_id = spill_ids[0]
-
-            default_idx = spill_ids.index(st.session_state.selected_spill_id)
-            selected_spill_label = st.selectbox(
-                "Spill Focus",
-                options=spill_labels,
-                index=default_idx,
-                help="AI will analyze this spill.",
-                key="assistant_spill_select",
-            )
-            st.session_state.selected_spill_id = spill_ids[spill_labels.index(selected_spill_label)]
-
-            # Build context
-            sel_feature = next(
-                f for f in features
-                if f["properties"].get("spill_id") == st.session_state.selected_spill_id
+            chat_fragment(
+                zone_id,
+                features,
+                get_zone_meta(zone_id),
+                history_summaries().get(zone_id, NO_HISTORY_MSG),
             )
-            spill_props = sel_feature["properties"]
-            zone_meta = get_zone_meta(zone_id)
-            history_text = get_history_summary(zone_id)
-
-            # Chat container with fixed height & scroll
-            with st.container(height=400, border=True):
-                if not st.session_state.chat_messages:
-                    st.caption("Ask a question about this spill or area to get started.")
-
-                for msg in st.session_state.chat_messages:
-                    role = msg["role"]
-                    content = msg["content"]
-
-                    if role == "user":
-                        with st.chat_message("user"):
-                            st.markdown(content)
-                    else:
-                        with st.chat_message("assistant"):
-                            st.markdown(content)
-
-            # Chat input
-            user_query = st.chat_input("Ask about this spill or area...")
-            if user_query:
-                st.session_state.chat_messages.append({"role": "user", "content": user_query})
-                ai_answer = get_ai_response(zone_meta, spill_props, history_text, user_query)
-                st.session_state.chat_messages.append({"role": "assistant", "content": ai_answer})
-                st.rerun()
-
-            with st.expander("Historical Spill Pattern (used for AI reasoning)", expanded=False):
-                st.write(history_text)
 
 # ============================================================================
 # FOOTER
@@ -678,5 +1109,5 @@ with col2:
 st.markdown("---")
 st.caption(
     f"Scene: {SCENARIO_DATA['scene_id']} | Date: {SCENARIO_DATA['date']} | "
-    f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    f"Session started: {st.session_state.session_start.strftime('%Y-%m-%d %H:%M:%S')}"
 )
\ No newline at end of file